@@ -1,10 +1,20 @@
 import os
-import json
+import sys
 import logging
-import smtplib
-from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from collections import namedtuple
+from dataclasses import dataclass, field
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone, time as dt_time
+from pathlib import Path
+from html import escape
+from string import Template
+
+try:
+    # orjson decodes several times faster than the stdlib parser; its
+    # JSONDecodeError subclasses json.JSONDecodeError, so callers are unchanged.
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # ------------------------------------------------------------------------------
 # 1. Configure Logging
@@ -13,142 +23,283 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
+logger = logging.getLogger(__name__)
 
 # ------------------------------------------------------------------------------
-# 2. Load Workouts JSON
+# 2. Load Configuration
 # ------------------------------------------------------------------------------
 
 
-def load_workouts(json_path):
-    logging.info(f"Loading workouts from {json_path}")
+@dataclass(frozen=True, slots=True)
+class Config:
+    smtp_server: str
+    smtp_port: int
+    email_address: str
+    email_password: str = field(repr=False)
+    recipients: tuple[str, ...]
+
+
+def load_config():
+    """Build the Config from the environment and the optional .env file.
+
+    Raises ValueError if a setting is missing or malformed.
+    """
+    # Values from .env next to the script fill in anything the process
+    # environment leaves unset; os.environ itself is never modified.
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    dotenv_path = os.path.join(script_dir, ".env")
+    file_env = {}
+    if os.path.exists(dotenv_path):
+        from dotenv import dotenv_values
+
+        file_env = dotenv_values(dotenv_path)
+    env = {name: os.getenv(name) or file_env.get(name) for name in (
+        "SMTP_SERVER", "SMTP_PORT", "EMAIL_ADDRESS", "EMAIL_PASSWORD", "RECIPIENT_EMAIL")}
+    missing = [name for name, value in env.items() if not value]
+    if missing:
+        raise ValueError(
+            f"Missing environment variables: {', '.join(missing)}")
     try:
-        with open(json_path, "r") as f:
-            workout_data = json.load(f)
-        days = workout_data.get("days", [])
-        if not days:
-            logging.error("No workouts found in the JSON file.")
-            exit(1)
-        logging.info(f"Loaded {len(days)} days of workouts.")
-        return days
-    except FileNotFoundError:
-        logging.error(f"JSON file not found at {json_path}.")
-        exit(1)
-    except json.JSONDecodeError as e:
-        logging.error(f"Error decoding JSON: {e}")
-        exit(1)
+        smtp_port = int(env["SMTP_PORT"])
+    except ValueError:
+        raise ValueError(
+            f"SMTP_PORT is not a number: {env['SMTP_PORT']}") from None
+    # RECIPIENT_EMAIL may be a comma-separated list of addresses.
+    recipients = tuple(addr.strip()
+                       for addr in env["RECIPIENT_EMAIL"].split(",")
+                       if addr.strip())
+    if not recipients:
+        raise ValueError("RECIPIENT_EMAIL does not contain any addresses.")
+    return Config(
+        smtp_server=env["SMTP_SERVER"],
+        smtp_port=smtp_port,
+        email_address=env["EMAIL_ADDRESS"],
+        email_password=env["EMAIL_PASSWORD"],
+        recipients=recipients,
+    )
+
+
+# Loaded once by the __main__ block below; importing the module never reads
+# the environment or exits.
+CFG = None
 
 # ------------------------------------------------------------------------------
-# 3. Build Workout HTML
+# 3. Load Workouts JSON
 # ------------------------------------------------------------------------------
 
 
-def build_workout_html(day_info):
-    title = day_info.get("title", "Workout")
-    exercises = day_info.get("exercises", [])
+Exercise = namedtuple("Exercise", "name sets rest url")
+Day = namedtuple("Day", "title exercises")
+
+
+def _text(value, default):
+    return default if value is None else str(value)
+
+
+def parse_day(day):
+    # Defaults are filled in and every field is coerced to str once here, so
+    # rendering never needs dict.get() and html.escape() always gets a str.
+    return Day(
+        title=_text(day.get("title"), "Workout"),
+        exercises=tuple(
+            Exercise(
+                name=_text(ex.get("name"), "Unknown Exercise"),
+                sets=_text(ex.get("sets"), ""),
+                rest=_text(ex.get("rest"), ""),
+                url=_text(ex.get("url"), ""),
+            )
+            for ex in day.get("exercises", [])
+        ),
+    )
+
 
-    logging.info(f"Building HTML for: {title}")
+# Parsed days of the last workouts file read, keyed by its mtime so
+# repeated loads only re-parse the JSON after the file has been edited.
+_cache = {"path": None, "mtime": -1, "days": None}
 
-    html_content = f"""\
+
+def load_workouts(json_path):
+    """Return the parsed days from json_path.
+
+    Raises FileNotFoundError if the file is missing, json.JSONDecodeError if
+    it is not valid JSON, and ValueError if it holds no usable workouts.
+    """
+    mtime = os.stat(json_path).st_mtime_ns
+    if _cache["path"] == json_path and _cache["mtime"] == mtime:
+        return _cache["days"]
+    logger.info(f"Loading workouts from {json_path}")
+    workout_data = json_loads(Path(json_path).read_bytes())
+    try:
+        days = tuple(parse_day(day) for day in workout_data.get("days", []))
+    except (AttributeError, TypeError) as e:
+        raise ValueError(f"Malformed workouts file {json_path}: {e}") from e
+    if not days:
+        raise ValueError(f"No workouts found in {json_path}.")
+    logger.info(f"Loaded {len(days)} days of workouts.")
+    _cache.update(path=json_path, mtime=mtime, days=days)
+    return days
+
+# ------------------------------------------------------------------------------
+# 4. Build Workout HTML
+# ------------------------------------------------------------------------------
+
+
+HEADER = """\
     <html>
     <head>
         <style>
-            body {{
+            body {
                 font-family: Arial, sans-serif;
-            }}
-            .day-title {{
+            }
+            .day-title {
                 background-color: #f2f2f2;
                 padding: 10px;
                 border-radius: 5px;
                 font-size: 20px;
                 margin-bottom: 20px;
-            }}
-            .exercise {{
+            }
+            .exercise {
                 margin-bottom: 15px;
-            }}
-            .exercise a {{
+            }
+            .exercise a {
                 text-decoration: none;
                 color: #007BFF;
-            }}
+            }
         </style>
     </head>
     <body>
-        <div class="day-title">{title}</div>
-    """
+"""
 
-    for ex in exercises:
-        name = ex.get("name", "Unknown Exercise")
-        sets = ex.get("sets", "")
-        rest = ex.get("rest", "")
-        url = ex.get("url", "")
-
-        if url:
-            exercise_name = f'<a href="{url}" target="_blank">{name}</a>'
-        else:
-            exercise_name = name
+EXERCISE_TMPL = Template("""
+        <div class="exercise">
+            <p><strong>$name</strong></p>
+            <p>Sets/Reps: $sets</p>
+            <p>Rest: $rest</p>
+        </div>
+""")
 
-        html_content += f"""
+EXERCISE_LINK_TMPL = Template("""
         <div class="exercise">
-            <p><strong>{exercise_name}</strong></p>
-            <p>Sets/Reps: {sets}</p>
-            <p>Rest: {rest}</p>
+            <p><strong><a href="$url" target="_blank">$name</a></strong></p>
+            <p>Sets/Reps: $sets</p>
+            <p>Rest: $rest</p>
         </div>
-        """
+""")
 
-    html_content += """
+FOOTER = """
         <p><em>Tip:</em> Always warm up properly, focus on form, and stay hydrated!</p>
     </body>
     </html>
-    """
-    return html_content
+"""
+
+
+def build_workout_html(day):
+    logger.info(f"Building HTML for: {day.title}")
+
+    parts = [HEADER,
+             f'        <div class="day-title">{escape(day.title)}</div>\n']
+    for ex in day.exercises:
+        fields = {
+            "name": escape(ex.name),
+            "sets": escape(ex.sets),
+            "rest": escape(ex.rest),
+        }
+        if ex.url:
+            parts.append(EXERCISE_LINK_TMPL.substitute(fields, url=escape(ex.url)))
+        else:
+            parts.append(EXERCISE_TMPL.substitute(fields))
+    parts.append(FOOTER)
+    return "".join(parts)
+
+
+@lru_cache(maxsize=8)
+def render_day(day):
+    # Day is an immutable namedtuple of strings, so it is its own cache key:
+    # the same day's content is rendered once, and any edit to it in the
+    # JSON file produces a new key.
+    return build_workout_html(day)
 
 # ------------------------------------------------------------------------------
-# 4. Determine Today's Workout
+# 5. Determine Today's Workout
 # ------------------------------------------------------------------------------
 
 
-def get_today_workout(days_list):
-    today_index = datetime.utcnow().weekday()  # Monday=0, Sunday=6
-    logging.info(f"Today's index (UTC): {today_index}")
-    if today_index < len(days_list):
-        selected_workout_title = days_list[today_index].get(
-            'title', 'No Title')
-        # logging.info(f"Selected workout for index {
-        #              today_index}: {selected_workout_title}")
-        return days_list[today_index]
-    else:
-        logging.error("Today's workout index is out of range.")
-        exit(1)
+def get_today_index(days_list, now):
+    # Monday=0, Sunday=6; plans shorter than a week wrap around and repeat.
+    # load_workouts raises on an empty plan, so len(days_list) is never 0.
+    today_index = now.weekday() % len(days_list)
+    logger.info(f"Today's index (UTC): {today_index}")
+    return today_index
 
 # ------------------------------------------------------------------------------
-# 5. Send Email Function
+# 6. Send Email Function
 # ------------------------------------------------------------------------------
 
 
-def send_email(subject, html_body, smtp_server, smtp_port, email_address, email_password, recipient_email):
-    # logging.info(f"Preparing to send email to {
-    #              recipient_email} with subject '{subject}'")
-    msg = MIMEMultipart("alternative")
+def build_message(subject, html_body, to_addr):
+    from email.message import EmailMessage
+
+    msg = EmailMessage()
     msg["Subject"] = subject
-    msg["From"] = email_address
-    msg["To"] = recipient_email
-    msg.attach(MIMEText(html_body, "html"))
+    msg["From"] = CFG.email_address
+    msg["To"] = to_addr
+    msg.set_content("Today's workout is in the HTML version of this email.")
+    msg.add_alternative(html_body, subtype="html")
+    return msg
+
+
+def send_email(subject, html_body):
+    import smtplib
+    import smtp_client
+
+    # Recipients are Bcc'd so one transaction delivers to all of them without
+    # exposing the list; send_message strips the Bcc header before sending.
+    msg = build_message(subject, html_body, CFG.email_address)
+    msg["Bcc"] = ", ".join(CFG.recipients)
 
     try:
-        logging.info(f"Connecting to SMTP server: {smtp_server}:{smtp_port}")
-        with smtplib.SMTP(smtp_server, int(smtp_port)) as server:
-            server.starttls()
-            logging.info("Logging into SMTP server")
-            server.login(email_address, email_password)
-            logging.info("Sending email")
-            server.sendmail(email_address, recipient_email, msg.as_string())
-        logging.info(f"Email sent successfully to {recipient_email}.")
+        logger.info("Sending email")
+        refused = smtp_client.send_message(CFG, msg, CFG.recipients)
+        for addr, (code, resp) in refused.items():
+            logger.warning(f"Recipient {addr} refused: {code} {resp}")
+        delivered = [r for r in CFG.recipients if r not in refused]
+        logger.info(f"Email sent successfully to {', '.join(delivered)}.")
     except smtplib.SMTPException as smtp_err:
-        logging.error(f"SMTP error when sending email: {smtp_err}")
+        logger.error(f"SMTP error when sending email: {smtp_err}")
     except Exception as e:
-        logging.error(f"Unexpected error when sending email: {e}")
+        logger.error(f"Unexpected error when sending email: {e}")
+
+
+def send_many(recipients, subject, html_body):
+    """Send each recipient a personal copy over one shared SMTP session.
+
+    A batch of 30 or more is abandoned once a third of it has failed, since
+    that usually means the account is being throttled or blocked. Returns
+    the recipients the email was sent to.
+    """
+    import smtplib
+    import smtp_client
+
+    sent = []
+    failures = 0
+    for addr in recipients:
+        msg = build_message(subject, html_body, addr)
+        try:
+            smtp_client.send_message(CFG, msg, [addr])
+        except (smtplib.SMTPException, OSError) as smtp_err:
+            logger.error(f"SMTP error when sending email to {addr}: {smtp_err}")
+            failures += 1
+            if len(recipients) >= 30 and failures * 3 >= len(recipients):
+                logger.error(
+                    f"Aborting batch after {failures} failed sends.")
+                break
+        else:
+            sent.append(addr)
+    logger.info(f"Sent {len(sent)} of {len(recipients)} emails.")
+    return sent
 
 # ------------------------------------------------------------------------------
-# 6. Main Execution
+# 7. Main Execution
 # ------------------------------------------------------------------------------
 
 
@@ -157,25 +308,95 @@ def main():
     json_file_path = os.path.join(script_dir, "workouts.json")
     days_list = load_workouts(json_file_path)
 
-    workout_today = get_today_workout(days_list)
-    subject = f"{workout_today.get(
-        'title', 'Your Workout')} - {datetime.utcnow().strftime('%A')}"
-    html_body = build_workout_html(workout_today)
+    now = datetime.now(timezone.utc)
+    today_index = get_today_index(days_list, now)
+    workout_today = days_list[today_index]
+    subject = f"{workout_today.title} - {now.strftime('%A')}"
+    html_body = render_day(workout_today)
 
-    # Fetch environment variables
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = os.getenv("SMTP_PORT")
-    email_address = os.getenv("EMAIL_ADDRESS")
-    email_password = os.getenv("EMAIL_PASSWORD")
-    recipient_email = os.getenv("RECIPIENT_EMAIL")
+    send_email(subject, html_body)
 
-    if not all([smtp_server, smtp_port, email_address, email_password, recipient_email]):
-        logging.error("One or more environment variables are missing.")
-        exit(1)
+# ------------------------------------------------------------------------------
+# 8. Scheduler Mode
+# ------------------------------------------------------------------------------
+
+SEND_HOUR = 6  # local time in SEND_TIMEZONE
+
+SEND_TIMEZONE = "US/Eastern"
+
+
+def next_send_time(now, tz, last_sent=None):
+    # last_sent is the local date of the previous send; never targeting it
+    # or an earlier date means a wall clock that steps backwards cannot
+    # produce a second send for the same day.
+    day = now.date()
+    if last_sent is not None and day <= last_sent:
+        day = last_sent + timedelta(days=1)
+    target = datetime.combine(day, dt_time(SEND_HOUR), tzinfo=tz)
+    if target <= now:
+        target = datetime.combine(
+            day + timedelta(days=1), dt_time(SEND_HOUR), tzinfo=tz)
+    return target
+
+
+def seconds_until(target, now):
+    # Compare timestamps: subtracting datetimes that share a tzinfo ignores
+    # a DST change between them.
+    return target.timestamp() - now.timestamp()
 
-    send_email(subject, html_body, smtp_server, smtp_port,
-               email_address, email_password, recipient_email)
+
+def run_scheduler():
+    import signal
+    import threading
+    from zoneinfo import ZoneInfo
+
+    eastern = ZoneInfo(SEND_TIMEZONE)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    logger.info("Daily Workout Scheduler script started.")
+    logger.info(
+        f"Scheduling daily workout at {SEND_HOUR:02d}:00. Now entering loop...")
+    # Sleep straight through to the next send instead of polling; the wait
+    # returns early when SIGTERM sets stop.
+    last_sent = None
+    while True:
+        now = datetime.now(eastern)
+        target = next_send_time(now, eastern, last_sent)
+        if stop.wait(seconds_until(target, now)):
+            break
+        # Event.wait runs on the monotonic clock, so if the wall clock was
+        # set back the wait can end before the target; wait again.
+        if datetime.now(eastern) < target:
+            continue
+        last_sent = target.date()
+        try:
+            main()
+        except (OSError, ValueError) as e:
+            # A missing or half-saved workouts.json should not kill the
+            # daemon; log it and try again at the next send time.
+            logger.error(f"Could not load workouts: {e}")
+        finally:
+            # The next send is a day away, far past SMTP_IDLE_TIMEOUT, so the
+            # connection could never be reused; release it now.
+            smtp_client = sys.modules.get("smtp_client")
+            if smtp_client is not None:
+                smtp_client.close_smtp()
+    logger.info("Scheduler stopped.")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        CFG = load_config()
+    except ValueError as e:
+        logger.error(str(e))
+        exit(1)
+
+    if "--schedule" in sys.argv[1:]:
+        run_scheduler()
+    else:
+        try:
+            main()
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load workouts: {e}")
+            exit(1)
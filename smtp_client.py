@@ -0,0 +1,280 @@
+"""SMTP transport for daily_workout.py.
+
+Kept separate so smtplib, ssl and their dependencies are only imported once
+an email is actually sent, not while the scheduler sleeps.
+"""
+import time
+import atexit
+import logging
+import smtplib
+import ssl
+
+logger = logging.getLogger(__name__)
+
+
+class PipeliningSMTP(smtplib.SMTP):
+    """SMTP client that batches MAIL/RCPT/DATA when the server allows it.
+
+    With RFC 2920 PIPELINING the whole envelope is written in one go and the
+    replies are read back in order, so a send costs one round trip for the
+    envelope instead of one per command. Servers that do not advertise the
+    extension go through the stock smtplib path.
+
+    The plaintext EHLO reply is also remembered per (host, port), so a
+    reconnect can send STARTTLS straight away. The EHLO after STARTTLS is
+    always sent, as RFC 3207 requires.
+    """
+
+    # (host, port) -> (ehlo_resp, esmtp_features) seen before STARTTLS, or
+    # False once that server has insisted on EHLO first.
+    _ehlo_cache = {}
+    _ehlo_key = None
+
+    def connect(self, host="localhost", port=0, source_address=None):
+        self._ehlo_key = (host, port)
+        return super().connect(host, port, source_address)
+
+    def ehlo(self, name=""):
+        reply = super().ehlo(name)
+        if (reply[0] == 250 and self._ehlo_key is not None
+                and not isinstance(self.sock, ssl.SSLSocket)
+                and self.has_extn("starttls")
+                and self._ehlo_cache.get(self._ehlo_key) is not False):
+            self._ehlo_cache[self._ehlo_key] = (
+                self.ehlo_resp, dict(self.esmtp_features))
+        return reply
+
+    def starttls(self, *args, **kwargs):
+        cached = self._ehlo_cache.get(self._ehlo_key)
+        if not cached or self.ehlo_resp or self.helo_resp:
+            return super().starttls(*args, **kwargs)
+
+        self.ehlo_resp, features = cached
+        self.esmtp_features = dict(features)
+        self.does_esmtp = True
+        try:
+            return super().starttls(*args, **kwargs)
+        except smtplib.SMTPServerDisconnected:
+            # Some servers hang up on STARTTLS before EHLO rather than
+            # answering 5xx; stop skipping EHLO so the retry gets through.
+            self._ehlo_cache[self._ehlo_key] = False
+            raise
+        except smtplib.SMTPResponseException as e:
+            # A 4xx such as "454 TLS not available" is temporary and says
+            # nothing about the skipped EHLO, so keep the cache and fail as
+            # stock smtplib would.
+            if e.smtp_code < 500:
+                raise
+
+        # The server wants a fresh EHLO before STARTTLS after all; stop
+        # skipping it for this server and do the full handshake now.
+        logger.info("Server rejected STARTTLS without EHLO, retrying with it")
+        self._ehlo_cache[self._ehlo_key] = False
+        self.ehlo_resp = None
+        self.esmtp_features = {}
+        self.does_esmtp = False
+        return super().starttls(*args, **kwargs)
+
+    def sendmail(self, from_addr, to_addrs, msg, mail_options=(),
+                 rcpt_options=()):
+        self.ehlo_or_helo_if_needed()
+        if (not self.has_extn("pipelining")
+                or any(opt.lower() == "smtputf8" for opt in mail_options)):
+            return super().sendmail(from_addr, to_addrs, msg,
+                                    mail_options, rcpt_options)
+        return self._pipeline_send(from_addr, to_addrs, msg,
+                                   mail_options, rcpt_options)
+
+    def _pipeline_send(self, from_addr, to_addrs, msg, mail_options,
+                       rcpt_options):
+        if isinstance(msg, str):
+            msg = smtplib._fix_eols(msg).encode("ascii")
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        mail_options = list(mail_options)
+        if self.has_extn("size"):
+            mail_options.append("size=%d" % len(msg))
+
+        commands = ["mail FROM:" + smtplib.quoteaddr(from_addr)
+                    + "".join(" " + opt for opt in mail_options)]
+        commands += ["rcpt TO:" + smtplib.quoteaddr(addr)
+                     + "".join(" " + opt for opt in rcpt_options)
+                     for addr in to_addrs]
+        commands.append("data")
+        for cmd in commands:
+            if "\r" in cmd or "\n" in cmd:
+                raise ValueError(
+                    f"command and arguments contain prohibited newline characters: {cmd!r}")
+        self.send("".join(cmd + smtplib.CRLF for cmd in commands))
+
+        (code, resp) = self.getreply()
+        if code == 421:
+            self.close()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+        sender_reply = (code, resp)
+
+        refused = {}
+        for addr in to_addrs:
+            (code, resp) = self.getreply()
+            if code not in (250, 251):
+                refused[addr] = (code, resp)
+            if code == 421:
+                self.close()
+                raise smtplib.SMTPRecipientsRefused(refused)
+
+        (code, resp) = self.getreply()
+        if sender_reply[0] != 250:
+            self._abort_pipeline(code)
+            raise smtplib.SMTPSenderRefused(*sender_reply, from_addr)
+        if len(refused) == len(to_addrs):
+            self._abort_pipeline(code)
+            raise smtplib.SMTPRecipientsRefused(refused)
+        if code != 354:
+            self._abort_pipeline(code)
+            raise smtplib.SMTPDataError(code, resp)
+
+        # send_message hands us the already-flattened bytes; append the
+        # terminator as one literal so the body is copied only once.
+        msg = smtplib._quote_periods(msg)
+        if msg.endswith(smtplib.bCRLF):
+            self.send(msg + b".\r\n")
+        else:
+            self.send(msg + b"\r\n.\r\n")
+        (code, resp) = self.getreply()
+        if code != 250:
+            self._abort_pipeline(code)
+            raise smtplib.SMTPDataError(code, resp)
+        return refused
+
+    def _abort_pipeline(self, code):
+        # A server that answered DATA with 354 is waiting for a body, and one
+        # that sent 421 is going away; neither can be reset in-band.
+        if code in (354, 421):
+            self.close()
+        else:
+            self._rset()
+
+
+class PipeliningSMTP_SSL(PipeliningSMTP, smtplib.SMTP_SSL):
+    """Implicit-TLS (SMTPS) variant of PipeliningSMTP."""
+
+
+class ResumingTLSContext(ssl.SSLContext):
+    """Client TLS context that offers the last session seen for each host.
+
+    Reconnects then resume via session tickets (RFC 5077 / TLS 1.3 PSK)
+    instead of repeating the full handshake; a stale or rejected ticket just
+    falls back to a full handshake.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.sessions = {}
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None,
+                    **kwargs):
+        if session is None:
+            session = self.sessions.get(server_hostname)
+        return super().wrap_socket(sock, *args, server_hostname=server_hostname,
+                                   session=session, **kwargs)
+
+    def remember(self, server):
+        if isinstance(server.sock, ssl.SSLSocket) and server.sock.session:
+            self.sessions[server.sock.server_hostname] = server.sock.session
+
+
+SMTPS_PORT = 465
+
+TLS_CONTEXT = ResumingTLSContext(ssl.PROTOCOL_TLS_CLIENT)
+TLS_CONTEXT.load_default_certs()
+
+# Idle connections older than this are dropped rather than health-checked,
+# since most providers close them server-side after about a minute.
+SMTP_IDLE_TIMEOUT = 60
+
+# A connection used more recently than this is trusted without a NOOP, so
+# back-to-back sends in a batch do not pay an extra round trip each.
+SMTP_NOOP_AFTER = 5
+
+# Socket timeout for every SMTP operation, so a silently dropped connection
+# cannot block the scheduler indefinitely.
+SMTP_TIMEOUT = 30
+
+# Cached SMTP session shared by every send, so TLS + AUTH is paid only once.
+_smtp_singleton = {"server": None, "last_used": 0.0}
+
+
+def close_smtp(quit=True):
+    """Drop the cached connection, saying QUIT first unless quit is False.
+
+    Pass quit=False for a connection that may already be dead, so closing it
+    never waits on a reply that will not come.
+    """
+    server = _smtp_singleton["server"]
+    _smtp_singleton["server"] = None
+    if server is None:
+        return
+    TLS_CONTEXT.remember(server)
+    if not quit:
+        server.close()
+        return
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+atexit.register(close_smtp)
+
+
+def get_smtp(cfg):
+    server = _smtp_singleton["server"]
+    if server is not None:
+        idle = time.monotonic() - _smtp_singleton["last_used"]
+        if idle < SMTP_NOOP_AFTER:
+            return server
+        try:
+            if idle < SMTP_IDLE_TIMEOUT and server.noop()[0] == 250:
+                return server
+        except (smtplib.SMTPException, OSError):
+            pass
+        logger.info("Cached SMTP connection is stale, reconnecting")
+        close_smtp(quit=False)
+
+    logger.info(
+        f"Connecting to SMTP server: {cfg.smtp_server}:{cfg.smtp_port}")
+    if cfg.smtp_port == SMTPS_PORT:
+        server = PipeliningSMTP_SSL(cfg.smtp_server, cfg.smtp_port,
+                                    timeout=SMTP_TIMEOUT, context=TLS_CONTEXT)
+    else:
+        server = PipeliningSMTP(cfg.smtp_server, cfg.smtp_port,
+                                timeout=SMTP_TIMEOUT)
+    try:
+        if cfg.smtp_port != SMTPS_PORT:
+            server.starttls(context=TLS_CONTEXT)
+        logger.info("Logging into SMTP server")
+        server.login(cfg.email_address, cfg.email_password)
+    except BaseException:
+        server.close()
+        raise
+    # Keep the session from the fresh handshake too, in case this connection
+    # later dies without a clean close.
+    TLS_CONTEXT.remember(server)
+    _smtp_singleton["server"] = server
+    _smtp_singleton["last_used"] = time.monotonic()
+    return server
+
+
+def send_message(cfg, msg, to_addrs):
+    """Send msg over the cached connection, reconnecting once if it dropped.
+
+    Returns the recipients the server refused, as smtplib.SMTP.sendmail does.
+    """
+    try:
+        refused = get_smtp(cfg).send_message(msg, to_addrs=to_addrs)
+    except smtplib.SMTPServerDisconnected:
+        logger.info("SMTP server closed the connection, retrying once")
+        close_smtp(quit=False)
+        refused = get_smtp(cfg).send_message(msg, to_addrs=to_addrs)
+    _smtp_singleton["last_used"] = time.monotonic()
+    return refused